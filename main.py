@@ -1,3 +1,5 @@
+import os
+
 from src.generate import generate_valid_number_set, iteration_check_dict
 from src.threshold_criteria import Threshold_Criteria
 from src.utils import (
@@ -29,6 +31,7 @@ def run():
         MAX_MULTIPLES_ALLOWED=MAX_MULTIPLES_ALLOWED,
         ODD_RANGE=ODD_RANGE,
         PATTERN_PROB_THRESHOLD=8,
+        workers=os.cpu_count(),
         debug=False,
     )
 
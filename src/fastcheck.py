@@ -0,0 +1,154 @@
+import numpy as np
+from numba import njit
+
+# Failure codes returned by check_candidate (0 means it passed), in check order.
+# They double as indexes into the counts array check_batch increments.
+FAIL_SUM = 1
+FAIL_MAIN_GAP = 2
+FAIL_RUN = 3
+FAIL_ODD_EVEN = 4
+FAIL_MULTIPLES = 5
+FAIL_CLUSTER = 6
+FAIL_LUCKY_GAP = 7
+NUM_FAILURE_CODES = 8
+
+# iteration_check_dict key each failure code is counted against
+FAILURE_KEYS = {
+    FAIL_SUM: "sum_in_range",
+    FAIL_MAIN_GAP: "gap_exceeds_threshold",
+    FAIL_RUN: "max_run",
+    FAIL_ODD_EVEN: "odd_even_balance",
+    FAIL_MULTIPLES: "exceed_multiples",
+    FAIL_CLUSTER: "cluster_count",
+    FAIL_LUCKY_GAP: "gap_exceeds_threshold",
+}
+
+
+@njit(cache=True)
+def _popcount(x):
+    """Count the set bits of a non-negative int64 (SWAR popcount)."""
+    x = x - ((x >> 1) & 0x5555555555555555)
+    x = (x & 0x3333333333333333) + ((x >> 2) & 0x3333333333333333)
+    x = (x + (x >> 4)) & 0x0F0F0F0F0F0F0F0F
+    return (x * 0x0101010101010101) >> 56
+
+
+@njit(cache=True, boundscheck=False)
+def check_candidate(
+    nums,
+    count_main,
+    sum_min,
+    sum_max,
+    main_gap,
+    lucky_gap,
+    odd_lo,
+    odd_hi,
+    odd_mask,
+    base_masks,
+    max_allowed,
+    cluster_masks,
+):
+    """
+    Run every number filter on one candidate and return the code of the first
+    rule it fails, or 0 if it passes them all.
+    nums: main numbers followed by lucky numbers, each part sorted ascending.
+    odd_mask: odd_mask(max_main), the odd numbers of the main range.
+    base_masks, max_allowed: MAX_MULTIPLES_ALLOWED as parallel arrays of
+    multiples_mask(base) and the max count allowed for that base.
+    cluster_masks: cluster_masks(max_main) as an array.
+    """
+    # Checks run cheapest and most selective first, so most rejected candidates
+    # exit after a handful of adds
+
+    # Check sum range of main numbers
+    total = 0
+    for i in range(count_main):
+        total += nums[i]
+    if total < sum_min or total > sum_max:
+        return FAIL_SUM
+
+    # Check gap between number positions and reject sets with 3 or more
+    # consecutive numbers, both from one pass over the gaps
+    max_gap = 0
+    max_run = 1
+    run = 1
+    for i in range(1, count_main):
+        gap = nums[i] - nums[i - 1]
+        if gap > max_gap:
+            max_gap = gap
+        if gap == 1:
+            run += 1
+            max_run = max(max_run, run)
+        else:
+            run = 1
+    if max_gap > main_gap:
+        return FAIL_MAIN_GAP
+    if max_run >= 3:
+        return FAIL_RUN
+
+    bits = 0
+    for i in range(count_main):
+        bits |= 1 << nums[i]
+
+    # Odd/even balance check
+    odd_count = _popcount(bits & odd_mask)
+    if odd_count < odd_lo or odd_count > odd_hi:
+        return FAIL_ODD_EVEN
+
+    # Check multiples count per base in main numbers; the caller orders the bases
+    # by how often they reject, so the loop exits as early as possible
+    for b in range(base_masks.shape[0]):
+        if _popcount(bits & base_masks[b]) > max_allowed[b]:
+            return FAIL_MULTIPLES
+
+    # Reject sets with more than 3 numbers in one cluster of 10
+    for c in range(cluster_masks.shape[0]):
+        if _popcount(bits & cluster_masks[c]) > 3:
+            return FAIL_CLUSTER
+
+    # Check gap between lucky number positions
+    for i in range(count_main + 1, nums.shape[0]):
+        if nums[i] - nums[i - 1] > lucky_gap:
+            return FAIL_LUCKY_GAP
+
+    return 0
+
+
+@njit(cache=True, boundscheck=False)
+def check_batch(
+    candidates,
+    count_main,
+    sum_min,
+    sum_max,
+    main_gap,
+    lucky_gap,
+    odd_lo,
+    odd_hi,
+    odd_mask,
+    base_masks,
+    max_allowed,
+    cluster_masks,
+    counts,
+):
+    """
+    Run check_candidate on every row of 'candidates' and return the failure codes,
+    adding one to counts[code] for every row (counts[0] tallies the passes).
+    """
+    codes = np.empty(candidates.shape[0], dtype=np.int64)
+    for row in range(candidates.shape[0]):
+        codes[row] = check_candidate(
+            candidates[row],
+            count_main,
+            sum_min,
+            sum_max,
+            main_gap,
+            lucky_gap,
+            odd_lo,
+            odd_hi,
+            odd_mask,
+            base_masks,
+            max_allowed,
+            cluster_masks,
+        )
+        counts[codes[row]] += 1
+    return codes
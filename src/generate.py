@@ -1,16 +1,22 @@
-from collections import Counter
-from tqdm import trange
+import multiprocessing
 
+import numpy as np
+from tqdm import tqdm
+
+from src.fastcheck import FAILURE_KEYS, NUM_FAILURE_CODES, check_batch
 from src.utils import (
-    generate_unique_numbers,
-    count_multiples,
-    max_gap_exceeds_threshold,
-    is_sum_in_range,
-    count_max_consecutive_run,
-    count_clusters_main_numbers,
+    generate_unique_number_batch,
     generate_pattern_probabilities,
+    multiples_mask,
+    odd_mask,
+    cluster_masks,
+    multiples_rejection_rate,
+    combination_keys,
 )
 
+# Number of candidates drawn and filtered per pass of the check kernel
+BATCH_SIZE = 100_000
+
 iteration_check_dict = {
     "generation_duplicate": 0,
     "exceed_multiples": 0,
@@ -23,6 +29,43 @@ iteration_check_dict = {
     "pattern_prob_threshold": 0,
 }
 
+# Slots of a search's counts array after the check_batch failure codes, for the
+# checks made in Python
+IDX_GENERATION_DUPLICATE = NUM_FAILURE_CODES
+IDX_HISTORICAL_DUPLICATE = NUM_FAILURE_CODES + 1
+IDX_PATTERN_PROB_THRESHOLD = NUM_FAILURE_CODES + 2
+
+# iteration_check_dict key each counts slot is reported under
+COUNT_KEYS = {
+    **FAILURE_KEYS,
+    IDX_GENERATION_DUPLICATE: "generation_duplicate",
+    IDX_HISTORICAL_DUPLICATE: "historical_duplicate",
+    IDX_PATTERN_PROB_THRESHOLD: "pattern_prob_threshold",
+}
+
+
+# Set in each Pool worker by _init_worker; tells workers another one has found a winner
+_stop_event = None
+
+
+def _init_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+
+def _worker(args):
+    """Pool entry point: run _search on one chunk of the iterations."""
+    lottery_numbers, iterations, seed, first_iteration, position, options = args
+    return _search(
+        lottery_numbers,
+        iterations,
+        np.random.default_rng(seed),
+        first_iteration,
+        position,
+        _stop_event,
+        **options,
+    )
+
 
 def generate_valid_number_set(
     lottery_numbers,
@@ -41,29 +84,145 @@ def generate_valid_number_set(
     ODD_RANGE=(1, 4),
     MAX_MULTIPLES_ALLOWED={2: 4, 3: 4, 4: 3, 5: 2, 6: 2, 7: 2, 8: 2, 9: 2, 10: 2},
     PATTERN_PROB_THRESHOLD=8,
+    batch_size=BATCH_SIZE,
+    seed=None,
+    workers=1,
     debug=False,
 ):
     """
     Generate a combination of main and lucky numbers that:
-      - Does NOT exist in lottery_numbers
+      - Does NOT exist in lottery_numbers (a (draws, 7) array, see get_latest_lottery_numbers)
       - Has an average positional historical frequency score >= min_score %
     Retries up to max_iterations times, returns the best found if none matches criteria.
+    Candidates are drawn batch_size at a time and the number filters are run over
+    the whole batch by the compiled check_batch kernel; only the survivors are
+    checked against history and scored.
+    seed is passed to numpy.random.default_rng, so a fixed seed reproduces a run.
+    With workers > 1 the iterations are split across a process pool, each worker
+    drawing from its own stream spawned from seed, and all workers stop as soon as
+    one finds a combination scoring >= min_score.
     """
 
     print(f"\nRunning Lottery Number Generator. Max Iterations: {max_iterations}")
 
-    # Convert lottery_numbers to a set for O(1) lookups
-    lottery_numbers_set = set(lottery_numbers)
-    total_draws = len(lottery_numbers)
-    num_positions = len(lottery_numbers[0])
+    options = dict(
+        min_main=min_main,
+        max_main=max_main,
+        count_main=count_main,
+        min_lucky=min_lucky,
+        max_lucky=max_lucky,
+        count_lucky=count_lucky,
+        min_score=min_score,
+        SUM_MIN=SUM_MIN,
+        SUM_MAX=SUM_MAX,
+        MAX_MAIN_GAP_THRESHOLD=MAX_MAIN_GAP_THRESHOLD,
+        MAX_LUCKY_GAP_THRESHOLD=MAX_LUCKY_GAP_THRESHOLD,
+        ODD_RANGE=ODD_RANGE,
+        MAX_MULTIPLES_ALLOWED=MAX_MULTIPLES_ALLOWED,
+        PATTERN_PROB_THRESHOLD=PATTERN_PROB_THRESHOLD,
+        batch_size=batch_size,
+        debug=debug,
+    )
+
+    if workers <= 1:
+        rng = np.random.default_rng(seed)
+        results = [_search(lottery_numbers, max_iterations, rng, 0, 0, None, **options)]
+    else:
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        chunk_size, remainder = divmod(max_iterations, workers)
+        chunks = [chunk_size + (i < remainder) for i in range(workers)]
+        starts = [sum(chunks[:i]) for i in range(workers)]
+        tasks = [
+            (lottery_numbers, chunks[i], seeds[i], starts[i], i, options)
+            for i in range(workers)
+        ]
+        stop_event = multiprocessing.Event()
+        with multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(stop_event,)
+        ) as pool:
+            results = list(pool.imap_unordered(_worker, tasks))
+
+    for *_, check_counts in results:
+        for key, count in check_counts.items():
+            iteration_check_dict[key] += count
+
+    best_combination, best_score, best_pattern_prob, best_iteration, _ = max(
+        results, key=lambda result: result[1]
+    )
+
+    if best_score < min_score:
+        print(
+            f"Max iterations reached. Best score so far: {best_score:.2f}%. Found at iteration {best_iteration}"
+        )
+    return best_combination, best_score, best_pattern_prob
+
+
+def _search(
+    lottery_numbers,
+    max_iterations,
+    rng,
+    first_iteration,
+    position,
+    stop_event,
+    min_main,
+    max_main,
+    count_main,
+    min_lucky,
+    max_lucky,
+    count_lucky,
+    min_score,
+    SUM_MIN,
+    SUM_MAX,
+    MAX_MAIN_GAP_THRESHOLD,
+    MAX_LUCKY_GAP_THRESHOLD,
+    ODD_RANGE,
+    MAX_MULTIPLES_ALLOWED,
+    PATTERN_PROB_THRESHOLD,
+    batch_size,
+    debug,
+):
+    """
+    Run up to max_iterations candidates of generate_valid_number_set's search,
+    numbering them from first_iteration + 1 and drawing from rng.
+    Stops early on a combination scoring >= min_score (setting stop_event, if given)
+    or when stop_event is set by another worker.
+    Returns (best_combination, best_score, best_pattern_prob, best_iteration, check_counts),
+    where check_counts holds this search's rejections per iteration_check_dict key.
+    """
+    # Rejections are counted in a flat array (incremented inside check_batch for the
+    # number filters) and only turned into an iteration_check_dict-style dict on return
+    counts = np.zeros(IDX_PATTERN_PROB_THRESHOLD + 1, dtype=np.int64)
 
-    # Precompute frequency counters per position
-    position_counters = [
-        Counter(draw[pos] for draw in lottery_numbers) for pos in range(num_positions)
-    ]
+    # Encode lottery_numbers as combination keys for O(1) lookups
+    historical_keys = frozenset(combination_keys(lottery_numbers, count_main).tolist())
+    total_draws, num_positions = lottery_numbers.shape
+
+    # Precompute historical frequency (%) of each number at each position, with room
+    # for historical numbers above max_main/max_lucky
+    max_number = max(max_main, max_lucky, int(lottery_numbers.max(initial=0)))
+    pos_freq = np.stack(
+        [np.bincount(column, minlength=max_number + 1) for column in lottery_numbers.T]
+    ).astype(float)
+    if total_draws > 0:
+        pos_freq *= 100 / total_draws
+    positions = np.arange(num_positions)
+
+    # Try the bases most likely to reject a candidate first
+    multiples_limits = sorted(
+        MAX_MULTIPLES_ALLOWED.items(),
+        key=lambda item: multiples_rejection_rate(
+            *item, count_main, min_main, max_main
+        ),
+        reverse=True,
+    )
+    base_masks = np.array(
+        [multiples_mask(base, max_main) for base, _ in multiples_limits],
+        dtype=np.int64,
+    )
+    max_multiples = np.array([limit for _, limit in multiples_limits], dtype=np.int64)
+    main_odd_mask = odd_mask(max_main)
+    main_cluster_masks = np.array(cluster_masks(max_main), dtype=np.int64)
 
-    tried_main_combinations = set()
-    tried_lucky_combinations = set()
     tried_combined_combinations = set()
 
     best_score = 0
@@ -71,155 +230,134 @@ def generate_valid_number_set(
     best_pattern_prob = None
     best_iteration = 0
 
-    for iteration in trange(1, max_iterations + 1, desc="Generating"):
-        main_nums = generate_unique_numbers(
-            count_main,
-            min_main,
-            max_main,
-            existing_combinations=tried_main_combinations,
-        )
-
-        # Check multiples count per base in main numbers
-        exceeds_multiples_limit = False
-        for base, max_allowed in MAX_MULTIPLES_ALLOWED.items():
-            if count_multiples(main_nums, base) > max_allowed:
-                exceeds_multiples_limit = True
-                iteration_check_dict["exceed_multiples"] += 1
-                tried_main_combinations.add(tuple(main_nums))
-                if debug:
-                    print(
-                        f"Iteration {iteration}: Too many multiples of {base} in main numbers. Regenerating..."
-                    )
+    iteration = 0
+    desc = "Generating" if stop_event is None else f"Worker {position}"
+    with tqdm(total=max_iterations, desc=desc, position=position) as progress:
+        while iteration < max_iterations:
+            if stop_event is not None and stop_event.is_set():
                 break
-        if exceeds_multiples_limit:
-            continue
 
-        # Check gap between number positions
-        if max_gap_exceeds_threshold(main_nums, max_gap_allowed=MAX_MAIN_GAP_THRESHOLD):
-            iteration_check_dict["gap_exceeds_threshold"] += 1
-            tried_main_combinations.add(tuple(main_nums))
-            if debug:
-                print(
-                    f"Iteration {iteration}: Gap exceeds max allowed {MAX_MAIN_GAP_THRESHOLD}. Regenerating..."
-                )
-            continue
+            size = min(batch_size, max_iterations - iteration)
+            main_batch = generate_unique_number_batch(
+                rng, size, count_main, min_main, max_main, dtype=np.int8
+            )
+            lucky_batch = generate_unique_number_batch(
+                rng, size, count_lucky, min_lucky, max_lucky, dtype=np.int8
+            )
+            candidates = np.concatenate((main_batch, lucky_batch), axis=1)
 
-        # Check sum range of main numbers
-        if not is_sum_in_range(main_nums, SUM_MIN, SUM_MAX):
-            iteration_check_dict["sum_in_range"] += 1
-            tried_main_combinations.add(tuple(main_nums))
-            if debug:
-                print(
-                    f"Iteration {iteration}: Sum {sum(main_nums)} outside range ({SUM_MIN}-{SUM_MAX}). Regenerating..."
-                )
-            continue
-
-        # Check consecutive runs only on main_nums
-        max_run = count_max_consecutive_run(main_nums)
-        if max_run >= 3:
-            # Reject this set because it has 3 or more consecutive numbers
-            iteration_check_dict["max_run"] += 1
-            tried_main_combinations.add(tuple(main_nums))
-            if debug:
-                print(
-                    f"Iteration {iteration}: Main numbers have {max_run} consecutive numbers. Regenerating..."
-                )
-            continue
+            codes = check_batch(
+                candidates,
+                count_main,
+                SUM_MIN,
+                SUM_MAX,
+                MAX_MAIN_GAP_THRESHOLD,
+                MAX_LUCKY_GAP_THRESHOLD,
+                ODD_RANGE[0],
+                ODD_RANGE[1],
+                main_odd_mask,
+                base_masks,
+                max_multiples,
+                main_cluster_masks,
+                counts,
+            )
+            survivors = np.flatnonzero(codes == 0)
 
-        # Odd/even balance check
-        odd_count = sum(1 for num in main_nums if num % 2 == 1)
-        if odd_count < ODD_RANGE[0] or odd_count > ODD_RANGE[1]:
-            iteration_check_dict["odd_even_balance"] += 1
-            tried_main_combinations.add(tuple(main_nums))
             if debug:
                 print(
-                    f"Iteration {iteration}: Odd count {odd_count} outside balanced range (2 or 3). Regenerating..."
+                    f"Iterations {iteration + 1}-{iteration + size}: "
+                    f"{len(survivors)} of {size} candidates passed the number filters"
                 )
-            continue
 
-        # Check clustering on main_nums
-        cluster_counts = count_clusters_main_numbers(main_nums)
-        if any(count > 3 for count in cluster_counts.values()):
-            iteration_check_dict["cluster_count"] += 1
-            tried_main_combinations.add(tuple(main_nums))
-            if debug:
-                print(
-                    f"Iteration {iteration}: Main numbers too clustered. Groups: {cluster_counts}. Regenerating..."
-                )
-            continue
+            survivor_nums = candidates[survivors]
 
-        lucky_nums = generate_unique_numbers(
-            count_lucky,
-            min_lucky,
-            max_lucky,
-            existing_combinations=tried_lucky_combinations,
-        )
+            survivor_keys = combination_keys(survivor_nums, count_main)
 
-        # Check gap between number positions
-        if max_gap_exceeds_threshold(
-            lucky_nums, max_gap_allowed=MAX_LUCKY_GAP_THRESHOLD
-        ):
-            iteration_check_dict["gap_exceeds_threshold"] += 1
-            tried_lucky_combinations.add(tuple(lucky_nums))
-            if debug:
-                print(
-                    f"Iteration {iteration}: lucky_nums Gap exceeds max allowed {MAX_LUCKY_GAP_THRESHOLD}. Regenerating..."
+            # Calculate propbability score based on historical draws for every survivor
+            survivor_probs = pos_freq[positions, survivor_nums]
+            survivor_scores = survivor_probs.mean(axis=1)
+
+            for row, (offset, key, avg_score) in enumerate(
+                zip(
+                    survivors.tolist(),
+                    survivor_keys.tolist(),
+                    survivor_scores.tolist(),
                 )
-            continue
+            ):
+                candidate_iteration = first_iteration + iteration + offset + 1
 
-        combined_nums = main_nums + lucky_nums
-        combined_tuple = tuple(str(num).zfill(2) for num in combined_nums)
+                if key in tried_combined_combinations:
+                    counts[IDX_GENERATION_DUPLICATE] += 1
+                    if debug:
+                        print(
+                            f"Iteration {candidate_iteration}: Generation duplicate found. Regenerating..."
+                        )
+                    continue
 
-        if combined_tuple in tried_combined_combinations:
-            iteration_check_dict["generation_duplicate"] += 1
-            if debug:
-                print(
-                    f"Iteration {iteration}: Generation duplicate found. Regenerating..."
-                )
-                continue
+                # Check if comnbination appears in historical numbers
+                if key in historical_keys:
+                    counts[IDX_HISTORICAL_DUPLICATE] += 1
+                    tried_combined_combinations.add(key)
+                    if debug:
+                        print(
+                            f"Iteration {candidate_iteration}: Combination exists. Retrying..."
+                        )
+                    continue
 
-        # Check if comnbination appears in historical numbers
-        if combined_tuple in lottery_numbers_set:
-            iteration_check_dict["historical_duplicate"] += 1
-            tried_combined_combinations.add(combined_tuple)
-            if debug:
-                print(f"Iteration {iteration}: Combination exists. Retrying...")
-            continue
-
-        # Calculate propbability score based on historical draws
-        probs = []
-        for index, num_str in enumerate(combined_tuple):
-            count = position_counters[index].get(num_str, 0)
-            prob = (count / total_draws) * 100 if total_draws > 0 else 0
-            probs.append(prob)
-
-        pattern_prob = generate_pattern_probabilities(probs)
-
-        # if (
-        #     pattern_prob["5_main+1_lucky_special_1"] < PATTERN_PROB_THRESHOLD
-        #     or pattern_prob["5_main+1_lucky_special_2"] < PATTERN_PROB_THRESHOLD
-        # ):
-        #     iteration_check_dict["pattern_prob_threshold"] += 1
-        #     tried_combined_combinations.add(combined_tuple)
-        #     if debug:
-        #         print(f"Iteration {iteration}: pattern_prob_threshold hit. Retrying...")
-        #     continue
-
-        avg_score = sum(probs) / len(probs)
-
-        if avg_score > best_score:
-            best_score = avg_score
-            best_combination = combined_tuple
-            best_pattern_prob = pattern_prob
-            best_iteration = iteration
-
-        if avg_score >= min_score:
-            print(
-                f"Iteration {iteration}: Valid combination found with score {avg_score:.2f}%"
-            )
-            return best_combination, best_score, best_pattern_prob
+                # Pattern threshold check, disabled; enabling it needs
+                # check_pattern_threshold imported from src.utils
+                # if (
+                #     check_pattern_threshold(
+                #         survivor_probs[row].tolist(), PATTERN_PROB_THRESHOLD
+                #     )
+                #     is None
+                # ):
+                #     counts[IDX_PATTERN_PROB_THRESHOLD] += 1
+                #     tried_combined_combinations.add(key)
+                #     if debug:
+                #         print(f"Iteration {candidate_iteration}: pattern_prob_threshold hit. Retrying...")
+                #     continue
+
+                if avg_score > best_score:
+                    best_score = avg_score
+                    best_combination = tuple(survivor_nums[row].tolist())
+                    # Only the best candidate's pattern probabilities are reported
+                    best_pattern_prob = generate_pattern_probabilities(
+                        survivor_probs[row].tolist()
+                    )
+                    best_iteration = candidate_iteration
 
-    print(
-        f"Max iterations reached. Best score so far: {best_score:.2f}%. Found at iteration {best_iteration}"
+                if avg_score >= min_score:
+                    print(
+                        f"Iteration {candidate_iteration}: Valid combination found with score {avg_score:.2f}%"
+                    )
+                    if stop_event is not None:
+                        stop_event.set()
+                    # check_batch counted the whole batch; drop the untried candidates
+                    counts -= np.bincount(codes[offset + 1 :], minlength=counts.size)
+                    return (
+                        best_combination,
+                        best_score,
+                        best_pattern_prob,
+                        best_iteration,
+                        _count_dict(counts),
+                    )
+
+            iteration += size
+            progress.update(size)
+
+    return (
+        best_combination,
+        best_score,
+        best_pattern_prob,
+        best_iteration,
+        _count_dict(counts),
     )
-    return best_combination, best_score, best_pattern_prob
+
+
+def _count_dict(counts):
+    """Turn a search's counts array into a dict of iteration_check_dict keys."""
+    check_counts = dict.fromkeys(iteration_check_dict, 0)
+    for index, key in COUNT_KEYS.items():
+        check_counts[key] += int(counts[index])
+    return check_counts
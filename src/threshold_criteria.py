@@ -1,11 +1,28 @@
-from collections import Counter
+import hashlib
+import os
+import pickle
+
 import numpy as np
 
-from src.utils import generate_pattern_probabilities
+from src.utils import generate_pattern_probabilities, CACHE_DIR
+
+# Bump when the derivation below changes, so stale cached thresholds are not reused
+THRESHOLD_CACHE_VERSION = 1
 
 
 class Threshold_Criteria:
-    def __init__(self, lottery_numbers, debug=False):
+    def __init__(self, lottery_numbers, debug=False, use_cache=True):
+        """
+        Derive the generator's threshold criteria from historical lottery numbers.
+        Results are cached in CACHE_DIR keyed by a hash of the draws, so unchanged data
+        loads instantly; the cache is not read with debug=True, which prints the analysis.
+        """
+        cache_path = self.get_cache_path(lottery_numbers)
+        if use_cache and not debug and os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                self.__dict__.update(pickle.load(f))
+            return
+
         self.max_pattern_probs = self.get_max_pattern_probabilities(
             lottery_numbers, debug=debug
         )
@@ -26,22 +43,26 @@ class Threshold_Criteria:
             lottery_numbers, main_only=True, debug=debug
         )
 
+        if use_cache:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, "wb") as f:
+                pickle.dump(self.__dict__, f)
+
+    def get_cache_path(self, lottery_numbers):
+        """Return the cache file path for thresholds derived from these lottery numbers."""
+        draws = np.asarray(lottery_numbers, dtype=np.int64)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{THRESHOLD_CACHE_VERSION}:{draws.shape}".encode())
+        digest.update(draws.tobytes())
+        return os.path.join(CACHE_DIR, f"thresholds_{digest.hexdigest()}.pkl")
+
     def get_max_pattern_probabilities(self, lottery_numbers, debug=True):
-        num_positions = len(lottery_numbers[0])
-        position_counters = [
-            Counter(draw[pos] for draw in lottery_numbers)
-            for pos in range(num_positions)
-        ]
+        freq = self.get_position_frequencies(lottery_numbers)
         total_draws = len(lottery_numbers)
-        nums = self.get_top_numbers_historical(lottery_numbers)
+        top_numbers = freq.argmax(axis=1)
+        probs = freq[np.arange(len(freq)), top_numbers] / total_draws * 100
 
-        probs = []
-        for index, num_str in enumerate(nums):
-            count = position_counters[index].get(num_str, 0)
-            prob = (count / total_draws) * 100 if total_draws > 0 else 0
-            probs.append(prob)
-
-        pattern_prob = generate_pattern_probabilities(probs)
+        pattern_prob = generate_pattern_probabilities(probs.tolist())
 
         if debug:
             print("\nMax Pattern Probabilities Possible")
@@ -51,13 +72,20 @@ class Threshold_Criteria:
         return pattern_prob
 
     def get_top_numbers_historical(self, lottery_numbers):
-        top_numbers = []
-        for index in range(len(lottery_numbers[0])):
-            counter = Counter([x[index] for x in lottery_numbers])
-            most_common_key = counter.most_common(1)[0][0]
-            top_numbers.append(most_common_key)
+        freq = self.get_position_frequencies(lottery_numbers)
+        return tuple(freq.argmax(axis=1).tolist())
 
-        return tuple(top_numbers)
+    def get_position_frequencies(self, lottery_numbers):
+        """
+        Count how often each number was drawn at each position.
+        Returns an array of shape (positions, max number + 1) where [pos, num] is the count.
+        """
+        return np.stack(
+            [
+                np.bincount(column, minlength=int(lottery_numbers.max()) + 1)
+                for column in lottery_numbers.T
+            ]
+        )
 
     def analyze_odd_even_distribution(
         self, lottery_numbers, main_only=True, debug=False
@@ -65,22 +93,18 @@ class Threshold_Criteria:
         """
         Analyze the distribution of odd and even numbers in lottery draws.
         Args:
-        lottery_numbers: list of tuples/lists of numbers as strings or ints.
+        lottery_numbers: (draws, 7) array of numbers.
         main_only: If True, analyze only the main numbers (first 5).
         Returns:
         distribution dict mapping number_of_odd_numbers -> count_of_draws,
         and a tuple (low_threshold, high_threshold) of min and max odd counts observed.
         """
 
-        distribution = {}
-
-        length_to_check = 5 if main_only else len(lottery_numbers[0])
+        length_to_check = 5 if main_only else lottery_numbers.shape[1]
 
-        for draw in lottery_numbers:
-            # Convert to int if needed
-            numbers = [int(n) for n in draw[:length_to_check]]
-            odd_count = sum(1 for num in numbers if num % 2 == 1)
-            distribution[odd_count] = distribution.get(odd_count, 0) + 1
+        odd_counts = (lottery_numbers[:, :length_to_check] % 2).sum(axis=1)
+        counts, draws_per_count = np.unique(odd_counts, return_counts=True)
+        distribution = dict(zip(counts.tolist(), draws_per_count.tolist()))
 
         total_draws = len(lottery_numbers)
 
@@ -115,12 +139,7 @@ class Threshold_Criteria:
         Returns the sum range between lower_percentile and upper_percentile,
         and prints descriptive statistics.
         """
-        sums = []
-        for draw in lottery_numbers:
-            main_nums = [int(n) for n in draw[:main_count]]
-            sums.append(sum(main_nums))
-
-        sums_array = np.array(sums)
+        sums_array = lottery_numbers[:, :main_count].sum(axis=1)
 
         min_sum = sums_array.min()
         max_sum = sums_array.max()
@@ -130,7 +149,7 @@ class Threshold_Criteria:
         high_pct = np.percentile(sums_array, upper_percentile)
 
         if debug:
-            print(f"\nTotal draws analyzed: {len(sums)}")
+            print(f"\nTotal draws analyzed: {len(sums_array)}")
             print(f"Sum range: min={min_sum}, max={max_sum}")
             print(f"Mean sum: {mean_sum:.2f}, Median sum: {median_sum}")
             print(f"{lower_percentile}th percentile sum: {low_pct}")
@@ -148,7 +167,7 @@ class Threshold_Criteria:
         Analyze historical gaps and return max gap thresholds for main and lucky numbers based on percentile.
 
         Args:
-            lottery_numbers: historical lottery draws (list of tuples/lists).
+            lottery_numbers: historical lottery draws ((draws, 7) array).
             count_main: number of main numbers.
             count_lucky: number of lucky numbers.
             percentile: the percentile to select gap threshold (default 95).
@@ -160,33 +179,16 @@ class Threshold_Criteria:
         gap_data = self.analyze_gap_distribution(
             lottery_numbers, count_main, count_lucky
         )
-
-        # Helper to expand gap counts into sorted list of all gaps observed
-        def expand_gaps(counters):
-            gaps_list = []
-            for counter in counters:
-                for gap_size, count in counter.items():
-                    gaps_list.extend([gap_size] * count)
-            return gaps_list
-
-        main_gaps = (
-            expand_gaps(gap_data["main"]["gap_counters"])
-            if gap_data["main"]["gap_counters"]
-            else []
-        )
-        lucky_gaps = (
-            expand_gaps(gap_data["lucky"]["gap_counters"])
-            if gap_data["lucky"]["gap_counters"]
-            else []
-        )
+        main_gaps = gap_data["main"]["gaps"]
+        lucky_gaps = gap_data["lucky"]["gaps"]
 
         # If no data, fallback to defaults
-        if not main_gaps:
+        if main_gaps.size == 0:
             max_main_gap = 19
         else:
             max_main_gap = int(np.percentile(main_gaps, percentile))
 
-        if not lucky_gaps:
+        if lucky_gaps.size == 0:
             max_lucky_gap = 5
         else:
             max_lucky_gap = int(np.percentile(lucky_gaps, percentile))
@@ -196,10 +198,10 @@ class Threshold_Criteria:
     def analyze_gap_distribution(self, lottery_numbers, count_main=5, count_lucky=2):
         """
         Analyze gaps (differences) between consecutive numbers for main and lucky numbers across historical draws.
-        Return gap counters for main and lucky numbers.
+        Return the gaps for main and lucky numbers.
 
         Args:
-            lottery_numbers: List of tuples/lists where each draw has main numbers + lucky numbers.
+            lottery_numbers: (draws, 7) array where each row has main numbers + lucky numbers.
             count_main: Number of main numbers to consider (default 5).
             count_lucky: Number of lucky numbers to consider (default 2).
 
@@ -207,39 +209,21 @@ class Threshold_Criteria:
             dict with structure:
             {
                 'main': {
-                    'gap_counters': [Counter(), Counter(), ..., Counter()]  # One per gap position
+                    'gaps': ndarray of shape (draws, count_main - 1)  # One column per gap position
                 },
                 'lucky': {
-                    'gap_counters': [Counter(), ...]  # Similar for lucky numbers
+                    'gaps': ndarray of shape (draws, count_lucky - 1)  # Similar for lucky numbers
                 }
             }
         """
-
-        main_gap_counters = [Counter() for _ in range(count_main - 1)]
-        lucky_gap_counters = (
-            [Counter() for _ in range(count_lucky - 1)] if count_lucky > 1 else []
+        main_nums = np.sort(lottery_numbers[:, :count_main], axis=1)
+        lucky_nums = np.sort(
+            lottery_numbers[:, count_main : count_main + count_lucky], axis=1
         )
 
-        for draw in lottery_numbers:
-            # Assume draw is like (M1, M2, M3, M4, M5, L1, L2) all zero-padded strings
-            main_nums = sorted(int(n) for n in draw[:count_main])
-            lucky_nums = sorted(
-                int(n) for n in draw[count_main : count_main + count_lucky]
-            )
-
-            # Calculate gaps for main numbers
-            for i in range(len(main_nums) - 1):
-                gap = main_nums[i + 1] - main_nums[i]
-                main_gap_counters[i][gap] += 1
-
-            # Calculate gaps for lucky numbers if applicable
-            for i in range(len(lucky_nums) - 1):
-                gap = lucky_nums[i + 1] - lucky_nums[i]
-                lucky_gap_counters[i][gap] += 1
-
         return {
-            "main": {"gap_counters": main_gap_counters},
-            "lucky": {"gap_counters": lucky_gap_counters},
+            "main": {"gaps": np.diff(main_nums, axis=1)},
+            "lucky": {"gaps": np.diff(lucky_nums, axis=1)},
         }
 
     def generate_max_multiples_allowed(
@@ -250,22 +234,27 @@ class Threshold_Criteria:
         Uses the 95th percentile of multiples counts as threshold.
 
         Args:
-            lottery_numbers: list of historical draw tuples
+            lottery_numbers: (draws, 7) array of historical draws
             bases: iterable of bases to analyze, default 2 through 10
             main_only: consider only the first 5 numbers if True
 
         Returns:
             dict mapping base -> max multiples allowed (int)
         """
-        max_multiples_dict = {}
+        bases = list(bases)
+        multiples_counts = self.count_multiples_per_draw(
+            lottery_numbers, bases, main_only=main_only
+        )
 
-        for base in bases:
-            _, _, max_allowed = self.analyze_multiples_distribution(
-                lottery_numbers, base=base, main_only=main_only, debug=debug
-            )
-            max_multiples_dict[base] = max_allowed
+        # 95th percentile per base, all bases at once
+        max_allowed = np.percentile(multiples_counts, 95, axis=0).astype(int)
+        max_multiples_dict = dict(zip(bases, max_allowed.tolist()))
 
         if debug:
+            for base in bases:
+                self.analyze_multiples_distribution(
+                    lottery_numbers, base=base, main_only=main_only, debug=debug
+                )
             print("\nFinal max_multiples_allowed dict:")
             for base, max_count in max_multiples_dict.items():
                 print(f"  {base}: {max_count}")
@@ -278,31 +267,21 @@ class Threshold_Criteria:
         """
         Analyze how many numbers in each draw are multiples of 'base'.
         Args:
-            lottery_numbers: list of tuples/lists of numbers (strings or ints)
+            lottery_numbers: (draws, 7) array of numbers
             base: integer base to check multiples for (e.g., 3)
             main_only: if True, consider only main numbers (first 5), else all numbers (7)
         Returns:
             distribution: dict mapping number_of_multiples -> count_of_draws
-            example_draws: list of draws with 3 or more multiples (for illustration)
+            example_draws: array of draws with 3 or more multiples (for illustration)
             max_allowed: suggested max multiples allowed for this base (e.g., 95th percentile)
         """
-        distribution = {}
-        example_draws = []
-
-        length_to_check = 5 if main_only else len(lottery_numbers[0])
-
-        multiples_counts = []  # For percentile calculation
-
-        for draw in lottery_numbers:
-            numbers = [int(n) for n in draw[:length_to_check]]
+        multiples_counts = self.count_multiples_per_draw(
+            lottery_numbers, [base], main_only=main_only
+        )[:, 0]
 
-            count_multiples = sum(1 for num in numbers if num % base == 0)
-            multiples_counts.append(count_multiples)
-
-            distribution[count_multiples] = distribution.get(count_multiples, 0) + 1
-
-            if count_multiples >= 3:
-                example_draws.append(draw)
+        counts, draws_per_count = np.unique(multiples_counts, return_counts=True)
+        distribution = dict(zip(counts.tolist(), draws_per_count.tolist()))
+        example_draws = lottery_numbers[multiples_counts >= 3]
 
         total_draws = len(lottery_numbers)
 
@@ -328,3 +307,17 @@ class Threshold_Criteria:
             )
 
         return distribution, example_draws, max_allowed
+
+    def count_multiples_per_draw(self, lottery_numbers, bases, main_only=True):
+        """
+        Count how many numbers in each draw are multiples of each base.
+        Args:
+            lottery_numbers: (draws, 7) array of numbers
+            bases: list of integer bases
+            main_only: if True, consider only main numbers (first 5), else all numbers (7)
+        Returns:
+            ndarray of shape (draws, len(bases)) with the multiples count per draw and base
+        """
+        draws = lottery_numbers[:, :5] if main_only else lottery_numbers
+        is_multiple = draws[:, :, None] % np.asarray(bases)[None, None, :] == 0
+        return is_multiple.sum(axis=1)
@@ -1,18 +1,51 @@
-import requests, random, csv
+import requests, random, csv, math, os, time, array
+from functools import lru_cache
+from itertools import accumulate
 from bs4 import BeautifulSoup
 from io import StringIO
+import numpy as np
 import pandas as pd
 
+# Derived data (fetched draws, threshold criteria) is cached here between runs
+CACHE_DIR = ".cache"
+LOTTERY_DATA_CACHE = os.path.join(CACHE_DIR, "latest.parquet")
+LOTTERY_DATA_ETAG = os.path.join(CACHE_DIR, "latest.etag")
+LOTTERY_DATA_TTL = 6 * 60 * 60  # seconds
 
-def get_latest_lottery_numbers():
+NUMBER_COLUMNS = ["N1", "N2", "N3", "N4", "N5", "L1", "L2"]
+
+
+def get_latest_lottery_numbers(max_age=LOTTERY_DATA_TTL):
     """
-    Download and parse the latest lottery numbers as a list of zero-padded string tuples.
-    Each tuple has 7 elements: 5 main numbers + 2 lucky stars, all zero-padded strings.
+    Download and parse the latest lottery numbers as an int8 array of shape (draws, 7).
+    Each row has 5 main numbers followed by 2 lucky stars.
     If unable to fetch from the website, load from local CSV backup.
+    The parsed website data is cached as parquet: it is reused without a request
+    while younger than max_age seconds, and after that revalidated with its ETag,
+    so an unchanged page is not downloaded and parsed again.
     """
+    cached = os.path.exists(LOTTERY_DATA_CACHE)
+    if cached and time.time() - os.path.getmtime(LOTTERY_DATA_CACHE) < max_age:
+        df = pd.read_parquet(LOTTERY_DATA_CACHE)
+        print("Retrieved cached lottery numbers")
+        return _parse_lottery_numbers(df)
+
+    headers = {}
+    if cached and os.path.exists(LOTTERY_DATA_ETAG):
+        with open(LOTTERY_DATA_ETAG) as f:
+            headers["If-None-Match"] = f.read()
+
     url = "https://lottery.merseyworld.com/cgi-bin/lottery?days=20&Machine=Z&Ballset=0&order=1&show=1&year=0&display=CSV"
     try:
-        response = requests.get(url)
+        response = requests.get(url, headers=headers)
+
+        if response.status_code == 304:
+            # Not modified: keep the cached data and restart its max_age window
+            df = pd.read_parquet(LOTTERY_DATA_CACHE)
+            os.utime(LOTTERY_DATA_CACHE)
+            print("Retrieved cached lottery numbers (not modified)")
+            return _parse_lottery_numbers(df)
+
         soup = BeautifulSoup(response.text, "html.parser")
         pre_tag = soup.find("pre")
 
@@ -27,6 +60,16 @@ def get_latest_lottery_numbers():
         # Save to CSV after setting column names
         df.to_csv("lottery_numbers_backup.csv", index=False)
 
+        # Only cache live data, so a failed fetch is retried on the next run
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(LOTTERY_DATA_CACHE)
+        etag = response.headers.get("ETag")
+        if etag:
+            with open(LOTTERY_DATA_ETAG, "w") as f:
+                f.write(etag)
+        elif os.path.exists(LOTTERY_DATA_ETAG):
+            os.remove(LOTTERY_DATA_ETAG)
+
     except Exception as e:
         print(f"Failed to fetch lottery data from website: {e}")
         print("Loading lottery data from backup CSV file.")
@@ -36,20 +79,15 @@ def get_latest_lottery_numbers():
         except FileNotFoundError as e:
             raise FileNotFoundError("File not found. Aborting")
 
-    lottery_numbers = []
-    for _, row in df.iterrows():
-        try:
-            numbers_tuple = tuple(
-                str(int(row[col])).zfill(2)
-                for col in ["N1", "N2", "N3", "N4", "N5", "L1", "L2"]
-            )
-            lottery_numbers.append(numbers_tuple)
-        except ValueError:
-            # Skip rows that don't convert cleanly (e.g., header rows)
-            continue
-
     print("Retrieved latest lottery numbers")
-    return lottery_numbers
+    return _parse_lottery_numbers(df)
+
+
+def _parse_lottery_numbers(df):
+    """Extract the N1-N5, L1-L2 columns of a lottery results DataFrame as an int8 array."""
+    numbers = df[NUMBER_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    # Skip rows that don't convert cleanly (e.g., header rows)
+    return numbers.dropna().to_numpy(dtype=np.int8)
 
 
 def generate_random_number(min_value, max_value):
@@ -63,35 +101,61 @@ def generate_unique_numbers(
     Generate 'count' unique random integers between min_value and max_value inclusive,
     avoiding those in existing_combinations (set of tuples).
     """
-    attempts = 0
-    while attempts < max_attempts:
-        numbers = set()
-        while len(numbers) < count:
-            num = random.randint(min_value, max_value)
-            numbers.add(num)
-        numbers_tuple = tuple(sorted(numbers))
-
-        if existing_combinations is None or numbers_tuple not in existing_combinations:
-            return sorted(numbers)
+    for _ in range(max_attempts):
+        numbers = sorted(random.sample(range(min_value, max_value + 1), count))
 
-        attempts += 1
+        if existing_combinations is None or tuple(numbers) not in existing_combinations:
+            return numbers
 
     raise RuntimeError("Could not generate a unique number set after max attempts")
 
 
-def count_max_consecutive_run(numbers):
-    """Return the length of the longest consecutive run in the sorted list."""
-    if not numbers:
-        return 0
+def generate_unique_number_batch(
+    rng, size, count, min_value, max_value, dtype=np.int64
+):
+    """
+    Generate 'size' rows of 'count' unique random integers between min_value and
+    max_value inclusive, each row sorted ascending, with one numpy.random.Generator call.
+    Rows that drew a repeated number are redrawn until every row is unique.
+    """
+    numbers = rng.integers(min_value, max_value + 1, size=(size, count), dtype=dtype)
+    numbers.sort(axis=1)
+    repeated = (np.diff(numbers, axis=1) == 0).any(axis=1)
+    while repeated.any():
+        redrawn = rng.integers(
+            min_value, max_value + 1, size=(int(repeated.sum()), count), dtype=dtype
+        )
+        redrawn.sort(axis=1)
+        numbers[repeated] = redrawn
+        repeated = (np.diff(numbers, axis=1) == 0).any(axis=1)
+    return numbers
+
+
+def gap_and_run(numbers):
+    """
+    Return (max_gap, max_run) for a sorted list in a single pass: the largest gap
+    between consecutive numbers and the length of the longest consecutive run.
+    """
+    if len(numbers) == 0:
+        return 0, 0
+    max_gap = 0
     max_run = 1
     current_run = 1
     for i in range(1, len(numbers)):
-        if numbers[i] == numbers[i - 1] + 1:
+        gap = numbers[i] - numbers[i - 1]
+        if gap > max_gap:
+            max_gap = gap
+        if gap == 1:
             current_run += 1
             max_run = max(max_run, current_run)
         else:
             current_run = 1
-    return max_run
+    return max_gap, max_run
+
+
+def count_max_consecutive_run(numbers):
+    """Return the length of the longest consecutive run in the sorted list."""
+    return gap_and_run(numbers)[1]
 
 
 def count_clusters_main_numbers(main_nums, max_value=50, group_size=10):
@@ -100,25 +164,78 @@ def count_clusters_main_numbers(main_nums, max_value=50, group_size=10):
     main_nums: list or iterable of main number ints (e.g., [3, 22, 45, ...])
     max_value: maximum number value (default 50)
     group_size: size of each cluster (default 10)
-    Returns a dict mapping cluster index to count.
+    Returns a tuple of counts indexed by cluster (0 for 1-10, 1 for 11-20, ...).
+    """
+    bits = number_bits(main_nums)
+    return tuple(
+        (bits & mask).bit_count() for mask in cluster_masks(max_value, group_size)
+    )
+
+
+def number_bits(numbers):
+    """Encode unique numbers between 0 and 63 as a bitmask with bit n set for each number n."""
+    bits = 0
+    for num in numbers:
+        # int() so numpy integers (e.g. int8 draw rows) don't overflow the shift
+        bits |= 1 << int(num)
+    return bits
+
+
+@lru_cache(maxsize=None)
+def multiples_mask(base, max_value=50):
+    """Bitmask with bit k set for every multiple k of 'base' up to max_value."""
+    return sum(1 << k for k in range(0, max_value + 1, base))
+
+
+@lru_cache(maxsize=None)
+def odd_mask(max_value=50):
+    """Bitmask with bit k set for every odd number k up to max_value."""
+    return sum(1 << k for k in range(1, max_value + 1, 2))
+
+
+@lru_cache(maxsize=None)
+def cluster_masks(max_value=50, group_size=10):
+    """Bitmasks of each cluster 1..group_size, group_size+1..2*group_size, ... up to max_value."""
+    return tuple(
+        sum(1 << k for k in range(start, min(start + group_size, max_value + 1)))
+        for start in range(1, max_value + 1, group_size)
+    )
+
+
+def multiples_rejection_rate(base, max_allowed, count=5, min_value=1, max_value=50):
+    """
+    Probability that 'count' unique numbers drawn uniformly from min_value..max_value
+    contain more than max_allowed multiples of 'base' (hypergeometric tail).
     """
-    group_counts = {}
-    num_groups = (max_value + group_size - 1) // group_size  # e.g. 50/10=5 groups
+    multiples = max_value // base - (min_value - 1) // base
+    others = max_value - min_value + 1 - multiples
+    rejected = sum(
+        math.comb(multiples, k) * math.comb(others, count - k)
+        for k in range(max_allowed + 1, count + 1)
+    )
+    return rejected / math.comb(max_value - min_value + 1, count)
+
 
-    # Initialize counts
-    for i in range(num_groups):
-        group_counts[i] = 0
+# Lucky numbers (1-11) occupy the low LUCKY_BITS bits of a combination key
+LUCKY_BITS = 12
 
-    for num in main_nums:
-        group_index = (num - 1) // group_size
-        group_counts[group_index] += 1
 
-    return group_counts
+def combination_keys(combinations, count_main=5):
+    """
+    Encode each row of 'combinations' (main numbers first) as a single int, with
+    the main numbers' number_bits() above the lucky numbers'; returns an int64 array.
+    """
+    # OR of 1 << n is the sum for unique n
+    bits = np.left_shift(1, combinations, dtype=np.int64)
+    main_keys = bits[:, :count_main].sum(axis=1)
+    lucky_keys = bits[:, count_main:].sum(axis=1)
+    return main_keys << LUCKY_BITS | lucky_keys
 
 
 def count_multiples(numbers, base):
     """Count how many numbers in 'numbers' are multiples of 'base'."""
-    return sum(1 for num in numbers if num % base == 0)
+    bits = number_bits(numbers)
+    return (bits & multiples_mask(base, bits.bit_length())).bit_count()
 
 
 def max_gap_exceeds_threshold(main_nums, max_gap_allowed=15):
@@ -126,11 +243,7 @@ def max_gap_exceeds_threshold(main_nums, max_gap_allowed=15):
     Returns True if any consecutive gap in sorted main_nums exceeds max_gap_allowed.
     Otherwise, returns False.
     """
-    for i in range(len(main_nums) - 1):
-        gap = main_nums[i + 1] - main_nums[i]
-        if gap > max_gap_allowed:
-            return True
-    return False
+    return gap_and_run(main_nums)[0] > max_gap_allowed
 
 
 def is_sum_in_range(main_nums, min_sum, max_sum):
@@ -154,35 +267,45 @@ PATTERNS = [
 ]
 
 
-def generate_pattern_probabilities(probs):
-    pattern_prob = {}
-    for pattern in PATTERNS:
-        count_main, count_lucky, special = pattern
+def _pattern_key(count_main, count_lucky, special):
+    """Create a descriptive key for the pattern for readability."""
+    key = f"{count_main}_main+{count_lucky}_lucky"
+    if special is not None and count_lucky == 1:
+        key += f"_special_{special}"
+    return key
 
-        # Calculate the slice length: main numbers + lucky numbers (or just main if count_lucky=0)
-        if count_lucky == 0:
-            slice_end = count_main  # Only main numbers slice
-        else:
-            slice_end = count_main + count_lucky  # main + lucky slice
 
-        # Extract the relevant probability slice from probs
-        # probs is aligned with combined_tuple: main numbers first, then lucky numbers
-        pattern_probs_slice = probs[:slice_end]
+# Pattern keys and slice ends as parallel arrays, resolved once at import: the
+# slice covers the main numbers plus the lucky numbers (or just main if count_lucky=0)
+_PATTERN_KEYS = tuple(_pattern_key(*pattern) for pattern in PATTERNS)
+_PATTERN_ENDS = array.array(
+    "B", [count_main + count_lucky for count_main, count_lucky, _ in PATTERNS]
+)
 
-        # Calculate average score for this pattern slice
-        if len(pattern_probs_slice) > 0:
-            avg_score = sum(pattern_probs_slice) / len(pattern_probs_slice)
-        else:
-            avg_score = 0  # Defensive: pattern with zero length
 
-        # Create a descriptive key for the pattern for readability
-        key = f"{count_main}_main+{count_lucky}_lucky"
-        if special is not None and count_lucky == 1:
-            key += f"_special_{special}"
+def generate_pattern_probabilities(probs):
+    # probs is aligned with combined_nums: main numbers first, then lucky numbers,
+    # so every pattern averages a prefix of probs and can be read off running totals
+    totals = list(accumulate(probs))
+    pattern_prob = {}
+    for key, slice_end in zip(_PATTERN_KEYS, _PATTERN_ENDS):
+        # Shorter probs average whatever prefix is available, like probs[:slice_end]
+        end = min(slice_end, len(totals))
+        pattern_prob[key] = totals[end - 1] / end if end else 0
+    return pattern_prob
 
-        pattern_prob[key] = avg_score
 
-    return pattern_prob
+def check_pattern_threshold(probs, threshold):
+    """
+    Fast path for the generator's pattern threshold check: return the average of
+    the 5_main+1_lucky_special_* patterns, or None as soon as it is below threshold.
+    """
+    # Both special patterns average the same 6-number prefix in
+    # generate_pattern_probabilities, so one sum covers them
+    average = sum(probs[:6]) / 6
+    if average < threshold:
+        return None
+    return average
 
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.generate import generate_valid_number_set, iteration_check_dict
+from src.utils import generate_unique_number_batch
+
+
+def make_draws(size=200, seed=0):
+    """Synthetic (draws, 7) history: 5 main numbers from 1-50, 2 lucky from 1-11."""
+    rng = np.random.default_rng(seed)
+    main = generate_unique_number_batch(rng, size, 5, 1, 50, dtype=np.int8)
+    lucky = generate_unique_number_batch(rng, size, 2, 1, 11, dtype=np.int8)
+    return np.concatenate((main, lucky), axis=1)
+
+
+def test_custom_max_main_below_history():
+    lottery_numbers = make_draws()
+    assert lottery_numbers[:, :5].max() > 45
+
+    combination, score, _ = generate_valid_number_set(
+        lottery_numbers, max_main=45, min_score=100, max_iterations=1000, seed=1
+    )
+
+    assert combination is not None
+    assert max(combination[:5]) <= 45
+    assert score > 0
+
+
+def test_early_stop_counts_only_tried_candidates(capsys):
+    before = sum(iteration_check_dict.values())
+
+    generate_valid_number_set(make_draws(), min_score=1, max_iterations=1000, seed=3)
+
+    # The winner is the first iteration reaching min_score; nothing after it counts
+    winner = int(capsys.readouterr().out.split("Iteration ")[1].split(":")[0])
+    assert sum(iteration_check_dict.values()) - before < winner
@@ -0,0 +1,59 @@
+import numpy as np
+
+from src.utils import (
+    check_pattern_threshold,
+    count_clusters_main_numbers,
+    count_max_consecutive_run,
+    count_multiples,
+    gap_and_run,
+    generate_pattern_probabilities,
+    max_gap_exceeds_threshold,
+    number_bits,
+)
+
+# One draw as stored by get_latest_lottery_numbers: 5 main then 2 lucky, int8
+DRAW = np.array([[3, 12, 22, 45, 48, 2, 9]], dtype=np.int8)
+
+
+def test_number_bits_int8_row():
+    main = DRAW[0, :5]
+    assert number_bits(main) == number_bits([3, 12, 22, 45, 48])
+    assert number_bits(main) == sum(1 << num for num in (3, 12, 22, 45, 48))
+
+
+def test_count_multiples_int8_row():
+    main = DRAW[0, :5]
+    for base in range(2, 11):
+        assert count_multiples(main, base) == sum(
+            1 for num in main.tolist() if num % base == 0
+        )
+
+
+def test_count_clusters_main_numbers_int8_row():
+    assert count_clusters_main_numbers(DRAW[0, :5]) == (1, 1, 1, 0, 2)
+
+
+def test_gap_and_run_int8_row():
+    main = np.sort(DRAW[0, :5])
+    assert gap_and_run(main) == (23, 1)
+    assert count_max_consecutive_run(main) == 1
+    assert max_gap_exceeds_threshold(main, 15)
+    assert not max_gap_exceeds_threshold(main, 23)
+    assert gap_and_run(np.array([], dtype=np.int8)) == (0, 0)
+
+
+def test_check_pattern_threshold_matches_pattern_probabilities():
+    probs = [9.0, 8.0, 7.0, 6.0, 5.0, 4.0, 3.0]
+    pattern_prob = generate_pattern_probabilities(probs)
+    special = pattern_prob["5_main+1_lucky_special_1"]
+    assert special == pattern_prob["5_main+1_lucky_special_2"]
+
+    assert check_pattern_threshold(probs, special) == special
+    assert check_pattern_threshold(probs, special + 0.1) is None
+
+
+def test_generate_pattern_probabilities_short_probs():
+    pattern_prob = generate_pattern_probabilities([6.0, 4.0, 2.0])
+    assert pattern_prob["5_main+2_lucky"] == 4.0
+    assert pattern_prob["2_main+2_lucky"] == 4.0
+    assert generate_pattern_probabilities([]) == dict.fromkeys(pattern_prob, 0)